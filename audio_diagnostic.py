@@ -9,6 +9,8 @@ import os
 import sys
 import tempfile
 import platform
+import functools
+import importlib
 
 def print_header(text):
     """Print a formatted header."""
@@ -16,46 +18,52 @@ def print_header(text):
     print(f" {text}")
     print("=" * 60)
 
+# (module, display name, hint shown when missing) for each required package
+_DEPENDENCIES = (
+    ("numpy", "NumPy", "Run: pip install numpy"),
+    ("sounddevice", "Sounddevice", "Run: pip install sounddevice"),
+    ("webrtcvad", "WebRTC VAD", "Run: pip install webrtcvad"),
+    ("whisper", "Whisper", "Check installation in requirements.txt"),
+)
+
+def _try_import(name):
+    """Return True if the named module can be imported."""
+    try:
+        importlib.import_module(name)
+        return True
+    except ImportError:
+        return False
+
+@functools.lru_cache(maxsize=None)
+def _deps_present():
+    """Import each dependency once and remember which are available."""
+    return {name: _try_import(name) for name, _, _ in _DEPENDENCIES}
+
 def check_dependencies():
     """Check for required Python packages."""
     print_header("Checking dependencies")
     
-    try:
-        import numpy
-        print("✓ NumPy is installed")
-    except ImportError:
-        print("✗ NumPy is missing. Run: pip install numpy")
-    
-    try:
-        import sounddevice
-        print("✓ Sounddevice is installed")
-    except ImportError:
-        print("✗ Sounddevice is missing. Run: pip install sounddevice")
-        
-    try:
-        import webrtcvad
-        print("✓ WebRTC VAD is installed")
-    except ImportError:
-        print("✗ WebRTC VAD is missing. Run: pip install webrtcvad")
-        
-    try:
-        import whisper
-        print("✓ Whisper is installed")
-    except ImportError:
-        print("✗ Whisper is missing. Check installation in requirements.txt")
+    present = _deps_present()
+    for name, label, hint in _DEPENDENCIES:
+        if present[name]:
+            print(f"✓ {label} is installed")
+        else:
+            print(f"✗ {label} is missing. {hint}")
 
 def check_audio_devices():
     """Check available audio devices."""
     print_header("Checking audio devices")
     
     try:
-        import sounddevice as sd
-        devices = sd.query_devices()
+        from audio_utils import get_devices
+        devices, default_in, default_out = get_devices()
         print(f"Found {len(devices)} audio devices:")
         
         # Find default input/output devices
-        default_input = sd.query_devices(kind='input')
-        default_output = sd.query_devices(kind='output')
+        if default_in is None or default_out is None:
+            raise RuntimeError("No default input/output device available")
+        default_input = devices[default_in]
+        default_output = devices[default_out]
         
         print("\nDefault input device:")
         print(f"  {default_input['name']} (channels: {default_input['max_input_channels']})")
@@ -101,21 +109,29 @@ def check_temp_directory():
         print("- Check if antivirus software is blocking temp file creation")
         print("- Try running this script as administrator")
 
+@functools.lru_cache(maxsize=None)
+def _system_info():
+    """Collect system information, which doesn't change while the process runs."""
+    return (f"{platform.system()} {platform.release()} {platform.version()}",
+            platform.python_version(),
+            platform.machine())
+
 def check_system_info():
     """Display system information."""
     print_header("System information")
     
-    print(f"OS: {platform.system()} {platform.release()} {platform.version()}")
-    print(f"Python: {platform.python_version()}")
-    print(f"Architecture: {platform.machine()}")
+    os_name, python_version, machine = _system_info()
+    print(f"OS: {os_name}")
+    print(f"Python: {python_version}")
+    print(f"Architecture: {machine}")
 
 def check_basic_audio():
     """Try to record and play a short audio sample."""
     print_header("Testing audio recording and playback")
     
     try:
-        import numpy as np
         import sounddevice as sd
+        from audio_utils import peak_abs
         
         # Parameters
         duration = 3  # seconds
@@ -133,7 +149,7 @@ def check_basic_audio():
         sd.wait()
         
         # Check if audio was recorded
-        if np.abs(recording).max() > 0.01:
+        if peak_abs(recording) > 0.01:
             print("✓ Audio successfully recorded")
         else:
             print("⚠ Audio recorded, but signal level is very low")
@@ -8,6 +8,86 @@ import numpy as np
 import sounddevice as sd
 import wave
 
+# Numba is optional; without it peak_abs falls back to plain NumPy reductions
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(fastmath=True, cache=True)
+    def _peak_abs_kernel(x):
+        # Single pass over the samples, compiled to a tight SIMD loop
+        m = 0.0
+        for i in range(x.size):
+            v = x[i]
+            if v < 0:
+                v = -v
+            if v > m:
+                m = v
+        return m
+
+def peak_abs(x):
+    """
+    Return the peak absolute sample value of an audio buffer without allocating.
+    
+    Args:
+        x: Array of audio samples (any shape, float or integer dtype)
+        
+    Returns:
+        float: Largest absolute sample value, or 0.0 for an empty buffer
+    """
+    x = np.asarray(x).reshape(-1)
+    if x.size == 0:
+        return 0.0
+    if x.dtype.kind in 'iu':
+        # Negating the minimum overflows in a signed type (-(-32768) in int16),
+        # so compare as Python ints, which still needs no temporary array
+        return float(max(int(x.max()), -int(x.min())))
+    if NUMBA_AVAILABLE:
+        return float(_peak_abs_kernel(x))
+    # Two reductions, but no temporary abs() array
+    return float(max(x.max(), -x.min()))
+
+# Cached (devices, default_in, default_out) from the last PortAudio scan.
+# Only plain dicts and indices are kept so no PortAudio handles outlive the scan.
+_device_cache = None
+
+def _default_device_index(kind):
+    """Return the index of the default device of the given kind, or None."""
+    try:
+        return sd.query_devices(kind=kind)['index']
+    except Exception:
+        return None
+
+def get_devices(force=False):
+    """
+    Return the audio device list, enumerating devices only once per process.
+    
+    Device enumeration is slow on some host APIs (notably Windows WASAPI), so
+    the result is cached until invalidate_device_cache() is called.
+    
+    Args:
+        force: Re-enumerate devices even if a cached result exists
+        
+    Returns:
+        tuple: (devices, default_in, default_out) where devices is a list of dicts
+        and default_in/default_out are device indices (or None if unavailable)
+    """
+    global _device_cache
+    if _device_cache is None or force:
+        devices = [dict(device) for device in sd.query_devices()]
+        _device_cache = (devices,
+                         _default_device_index('input'),
+                         _default_device_index('output'))
+    return _device_cache
+
+def invalidate_device_cache():
+    """Forget the cached device list, e.g. after a device has been plugged in or removed."""
+    global _device_cache
+    _device_cache = None
+
 def check_audio_system(sample_rate=16000):
     """
     Check if the audio system is properly configured.
@@ -17,7 +97,7 @@ def check_audio_system(sample_rate=16000):
     """
     try:
         # Check if audio devices are available
-        devices = sd.query_devices()
+        devices, _, _ = get_devices()
         if len(devices) == 0:
             return False, "No audio devices found"
             
@@ -50,11 +130,18 @@ def save_audio_to_wav(audio_data, sample_rate=16000):
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp:
             temp_file = temp.name
             
-        # Process the audio data
-        audio_array = np.concatenate(audio_data, axis=0).flatten()
-        # Normalize audio data to 16-bit PCM
-        audio_array = np.clip(audio_array, -1.0, 1.0)
-        audio_int16 = (audio_array * 32767).astype(np.int16)
+        # Convert the audio data to 16-bit PCM chunk by chunk, writing straight
+        # into one output buffer instead of concatenating then copying per step
+        chunks = [np.asarray(chunk).reshape(-1) for chunk in audio_data]
+        audio_int16 = np.empty(sum(chunk.size for chunk in chunks), dtype=np.int16)
+        scratch = np.empty(max((chunk.size for chunk in chunks), default=0), dtype=np.float32)
+        pos = 0
+        for chunk in chunks:
+            buf = scratch[:chunk.size]
+            np.clip(chunk, -1.0, 1.0, out=buf)
+            np.multiply(buf, 32767, out=buf)
+            audio_int16[pos:pos + chunk.size] = buf
+            pos += chunk.size
         
         # Write WAV file using wave for better error handling
         with wave.open(temp_file, 'wb') as wf:
@@ -70,10 +157,10 @@ def save_audio_to_wav(audio_data, sample_rate=16000):
         return True, temp_file
         
     except Exception as e:
-        if temp_file and os.path.exists(temp_file):
+        if temp_file:
             try:
-                os.remove(temp_file)
-            except:
+                os.unlink(temp_file)
+            except OSError:
                 pass
         return False, str(e)
 
@@ -83,11 +170,18 @@ def cleanup_temp_file(file_path):
     
     Args:
         file_path: Path to the file to remove
+        
+    Returns:
+        bool: True if the file was removed, False if it didn't exist or couldn't be removed
     """
+    if not file_path:
+        return False
+    # Unlink directly rather than checking first: one syscall and no race
     try:
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
-            return True
-    except Exception as e:
+        os.unlink(file_path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
         print(f"Warning: Could not clean up temporary file {file_path}: {e}")
         return False
@@ -7,6 +7,9 @@ import sounddevice as sd
 import numpy as np
 import threading
 import queue
+import collections
+import functools
+import re
 import time
 import os
 import sys
@@ -14,7 +17,7 @@ import wave
 import tempfile
 from transformers import AutoModelForCausalLM, AutoTokenizer
 import whisper
-from audio_utils import save_audio_to_wav, cleanup_temp_file, check_audio_system as check_system
+from audio_utils import save_audio_to_wav, cleanup_temp_file, peak_abs, check_audio_system as check_system
 
 # Try to import webrtcvad - essential for voice activity detection
 # Define as global variable at module level
@@ -25,6 +28,13 @@ try:
 except ImportError:
     print("WARNING: webrtcvad not available, voice interruption detection will be disabled")
 
+# Try to import faster-whisper - optional, quicker CTranslate2 speech recognition backend
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
 # Try to import TTS - not essential for core functionality
 try:
     try:
@@ -34,9 +44,52 @@ try:
     TTS_AVAILABLE = True
 except ImportError:
     print("TTS not available, using system TTS fallback")
-    import pyttsx3
     TTS_AVAILABLE = False
 
+@functools.lru_cache(maxsize=None)
+def _get_pyttsx3_engine():
+    """Returns the process-wide system TTS engine, initializing it on first use"""
+    import pyttsx3
+    return pyttsx3.init()
+
+@functools.lru_cache(maxsize=32)
+def _tokenize_doc_prefix(tokenizer, doc_prefix):
+    """Tokenizes the document part of the prompt, cached by tokenizer and prefix text"""
+    return tokenizer(f"Document: {doc_prefix}...", return_tensors="pt", add_special_tokens=False).input_ids
+
+# Sentence boundaries used to split speech into separately synthesized chunks
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Number of synthesized sentences kept per agent for repeated phrases
+_PHRASE_CACHE_SIZE = 32
+
+def _conv1d_to_linear(module):
+    """Replaces GPT-2 style Conv1D layers with equivalent nn.Linear layers, in place"""
+    from transformers.pytorch_utils import Conv1D
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            # Conv1D computes x @ W + b with W stored as (in, out); Linear stores W transposed
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features, device="meta")
+            linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous(), requires_grad=False)
+            linear.bias = torch.nn.Parameter(child.bias.detach(), requires_grad=False)
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+@functools.lru_cache(maxsize=None)
+def _has_msvcrt():
+    """Check once whether the Microsoft Visual C++ runtime can be loaded"""
+    try:
+        import ctypes
+        ctypes.CDLL('msvcp140.dll')
+        return True
+    except Exception:
+        return False
+
+# Longest recording kept per listen() call (Whisper works on 30 s windows)
+MAX_RECORDING_SECONDS = 30
+
 class ConversationalAgent:
     """Main class for the conversational agent"""
     
@@ -47,7 +100,17 @@ class ConversationalAgent:
         
         # Load speech recognition model
         print("Loading speech recognition model...")
-        self.speech_model = whisper.load_model("base")
+        self.use_faster_whisper = FASTER_WHISPER_AVAILABLE
+        if self.use_faster_whisper:
+            try:
+                # int8 weights on CPU, FP16 on GPU
+                compute_type = "int8" if self.device == "cpu" else "float16"
+                self.speech_model = WhisperModel("base", device=self.device, compute_type=compute_type)
+            except Exception as e:
+                print(f"Failed to load faster-whisper model, falling back to whisper: {e}")
+                self.use_faster_whisper = False
+        if not self.use_faster_whisper:
+            self.speech_model = self._load_whisper_cached("base")
         
         # Load text generation model
         print("Loading text generation model...")
@@ -55,6 +118,41 @@ class ConversationalAgent:
         model_id = "distilgpt2"
         self.tokenizer = AutoTokenizer.from_pretrained(model_id)
         self.text_model = AutoModelForCausalLM.from_pretrained(model_id)
+        self.text_model.eval()
+        # The text model isn't moved to self.device, so check where it actually runs
+        if next(self.text_model.parameters()).device.type == "cpu":
+            # Dynamic int8 quantization of the transformer blocks cuts weight traffic
+            # during CPU decoding; keep the FP32 model if it isn't supported.
+            # lm_head is left alone because it shares its weights with the
+            # token embedding, and quantizing it would only add a second copy.
+            try:
+                from torch.ao.quantization import quantize_dynamic
+                _conv1d_to_linear(self.text_model.transformer)
+                quantize_dynamic(self.text_model.transformer, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            except Exception as e:
+                print(f"Could not quantize text generation model: {e}")
+        
+        # distilgpt2 has no pad token, so reuse EOS once here rather than per call
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token_id = self.tokenizer.eos_token_id
+        
+        # Pre-tokenized fixed parts of the prompt
+        self._user_ids = self._encode("User:")
+        self._doc_user_ids = self._encode("\n\nUser:")
+        self._assistant_ids = self._encode("\nAssistant:")
+        
+        # Generation settings shared by every response
+        self._gen_kwargs = dict(
+            max_new_tokens=100,  # Counts only generated tokens, not the prompt
+            num_return_sequences=1,
+            temperature=0.7,
+            do_sample=True,
+            top_k=50,
+            top_p=0.95,
+            use_cache=True,  # Reuse attention keys/values between decoding steps
+            eos_token_id=self.tokenizer.eos_token_id,  # Stop as soon as the model ends its answer
+            pad_token_id=self.tokenizer.pad_token_id
+        )
         
         # Text-to-Speech setup
         self.use_tts = use_tts and TTS_AVAILABLE
@@ -62,17 +160,20 @@ class ConversationalAgent:
             print("Loading TTS model...")
             try:
                 self.tts = TTS("tts_models/en/ljspeech/tacotron2-DDC")
+                # Play at the model's own rate (22.05 kHz for LJSpeech), not the mic rate
+                synthesizer = getattr(self.tts, "synthesizer", None)
+                self.tts_sample_rate = getattr(synthesizer, "output_sample_rate", None) or 16000
+                # Recently synthesized sentences, least recently used first
+                self._phrase_cache = collections.OrderedDict()
             except:
                 print("Failed to load TTS model, falling back to system TTS")
                 self.use_tts = False
-                import pyttsx3
-                self.tts_engine = pyttsx3.init()
         
         if not self.use_tts:
+            # The engine itself is created on first use by the tts_engine property
             print("Using system TTS")
-            if 'pyttsx3' not in locals():
-                import pyttsx3
-            self.tts_engine = pyttsx3.init()        # Voice activity detection for interruption detection
+        
+        # Voice activity detection for interruption detection
         self.vad = None
         global WEBRTCVAD_AVAILABLE
         if WEBRTCVAD_AVAILABLE:
@@ -86,139 +187,277 @@ class ConversationalAgent:
         # Audio parameters
         self.sample_rate = 16000
         self.frame_duration = 30  # ms
-        self.audio_queue = queue.Queue()
+        self.interrupt_event = threading.Event()  # Set when the user talks over playback
         self.is_speaking = False
         self.is_listening = False
         self.current_audio_level = 0.0
         
+        # Pre-allocated recording buffer, reused by every listen() call so the
+        # audio callback never allocates
+        self._rec_buf = np.empty((int(self.sample_rate * MAX_RECORDING_SECONDS), 1), dtype=np.float32)
+        self._rec_pos = 0  # Write position of the audio callback
+        self._vad_pos = 0  # Start of the next frame to run through VAD
+        # Pinned host staging buffer for copying recordings to the GPU
+        self._pinned_audio = None
+        if self.device == "cuda" and not self.use_faster_whisper:
+            self._pinned_audio = torch.empty(len(self._rec_buf), dtype=torch.float32, pin_memory=True)
+        self._vad_scratch = np.empty(int(self.sample_rate * self.frame_duration / 1000), dtype=np.int16)
+        # Compile the level kernel now rather than in the first audio callback
+        peak_abs(self._rec_buf[:1])
+        
         # Storage for callback functions
         self.audio_callback = None
         self.callback_wrapper = None
         
+    @functools.cached_property
+    def tts_engine(self):
+        """System TTS engine, initialized the first time speech falls back to it"""
+        return _get_pyttsx3_engine()
+    
+    def _load_whisper_cached(self, name):
+        """Loads a Whisper model, memory-mapping weights cached by a previous run"""
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "studybuddy")
+        cache_path = os.path.join(cache_dir, f"whisper_{name}_{torch.__version__}.pt")
+        
+        if os.path.exists(cache_path):
+            try:
+                # Weights are paged in on demand instead of unpickled up front
+                checkpoint = torch.load(cache_path, mmap=True, map_location=self.device, weights_only=True)
+            except Exception as e:
+                # Unreadable file: fall through and write a fresh one
+                print(f"Could not read cached speech model, reloading: {e}")
+            else:
+                try:
+                    return self._whisper_from_checkpoint(name, checkpoint)
+                except Exception as e:
+                    # The file is fine but this whisper/torch can't use it;
+                    # rewriting it would only fail the same way next time
+                    print(f"Could not build speech model from cache: {e}")
+                    return whisper.load_model(name, device=self.device)
+        
+        model = whisper.load_model(name, device=self.device)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write to a temporary name first so a partial file is never picked up
+            tmp_path = cache_path + ".tmp"
+            torch.save({"dims": vars(model.dims), "model_state_dict": model.state_dict()}, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"Warning: Could not cache speech model: {e}")
+            return model
+        
+        # Load the file back once through the fast path, so a cache that can't
+        # reproduce this model is dropped now instead of being read every launch
+        try:
+            checkpoint = torch.load(cache_path, mmap=True, map_location=self.device, weights_only=True)
+            cached = self._whisper_from_checkpoint(name, checkpoint).state_dict()
+            reference = model.state_dict()
+            if cached.keys() != reference.keys() or not all(torch.equal(cached[k], reference[k]) for k in reference):
+                raise RuntimeError("cached weights differ from the loaded model")
+        except Exception as e:
+            print(f"Warning: Discarding speech model cache: {e}")
+            # Drop the mapped tensors first; Windows can't delete a mapped file
+            checkpoint = cached = None
+            cleanup_temp_file(cache_path)
+        return model
+    
+    def _whisper_from_checkpoint(self, name, checkpoint):
+        """Builds a Whisper model around the tensors of a cached checkpoint"""
+        dims = whisper.model.ModelDimensions(**checkpoint["dims"])
+        
+        # Build the encoder and decoder on the meta device so no FP32 weights are
+        # allocated or randomly initialized only to be replaced by the mapped ones.
+        # Whisper.__init__ itself can't run there (it builds a sparse buffer), so
+        # the two halves are put together by hand.
+        model = whisper.model.Whisper.__new__(whisper.model.Whisper)
+        torch.nn.Module.__init__(model)
+        model.dims = dims
+        with torch.device("meta"):
+            model.encoder = whisper.model.AudioEncoder(
+                dims.n_mels, dims.n_audio_ctx, dims.n_audio_state, dims.n_audio_head, dims.n_audio_layer)
+            model.decoder = whisper.model.TextDecoder(
+                dims.n_vocab, dims.n_text_ctx, dims.n_text_state, dims.n_text_head, dims.n_text_layer)
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        
+        # Non-persistent buffers aren't in the checkpoint; rebuild them
+        # the way Whisper.__init__ does
+        model.decoder.register_buffer(
+            "mask", torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-np.inf).triu_(1),
+            persistent=False)
+        alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {})
+        if name in alignment_heads:
+            model.set_alignment_heads(alignment_heads[name])
+        else:
+            all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+            all_heads[dims.n_text_layer // 2:] = True
+            model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+        
+        if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+            raise RuntimeError("cached checkpoint is missing tensors")
+        return model.to(self.device)
+        
+    def _run_vad(self, stop_event):
+        """Runs VAD over 30ms frames of the recording buffer until stop_event is set"""
+        global WEBRTCVAD_AVAILABLE
+        frame_size = len(self._vad_scratch)
+        while not stop_event.is_set() and WEBRTCVAD_AVAILABLE:
+            if not self.is_speaking:
+                # Audio recorded while we're silent can't be a barge-in; skip it so
+                # VAD only ever scans frames that arrive during playback
+                self._vad_pos = self._rec_pos
+            if not (self.is_speaking and self._rec_pos - self._vad_pos >= frame_size):
+                # Wait for the next frame to arrive
+                stop_event.wait(self.frame_duration / 1000)
+                continue
+            
+            frame_data = self._rec_buf[self._vad_pos:self._vad_pos + frame_size, 0]
+            self._vad_pos += frame_size
+            try:
+                # Convert to 16-bit PCM in the shared scratch buffer
+                np.multiply(frame_data, 32767, out=self._vad_scratch, casting='unsafe')
+                
+                # Check if it's speech
+                if self.vad.is_speech(self._vad_scratch.tobytes(), self.sample_rate):
+                    self.interrupt_event.set()
+            except Exception as e:
+                print(f"VAD error: {e}")
+                # If there's a persistent VAD error, disable it
+                if str(e).find("file") >= 0:  # File-related error
+                    WEBRTCVAD_AVAILABLE = False
+                    print("Disabling VAD due to file errors")
+        
+    def _transcribe(self, audio):
+        """Transcribes an audio array or file path with the loaded speech model"""
+        if self.use_faster_whisper:
+            segments, _ = self.speech_model.transcribe(audio, beam_size=1, vad_filter=False)
+            return "".join(segment.text for segment in segments).strip()
+        
+        if self._pinned_audio is not None and isinstance(audio, np.ndarray) and len(audio) <= len(self._pinned_audio):
+            # Copy through the pinned buffer so the transfer to the GPU skips the
+            # driver's pageable-memory bounce; whisper then computes the mel there
+            staging = self._pinned_audio[:len(audio)]
+            staging.copy_(torch.from_numpy(audio))
+            audio = staging.to(self.device, non_blocking=True)
+        
+        # whisper only supports FP16 on GPU; asking for it on CPU just warns
+        with torch.inference_mode():
+            result = self.speech_model.transcribe(audio, fp16=(self.device == "cuda"))
+        return result["text"].strip()
+        
     def listen(self, timeout=5):
         """Records audio from microphone and returns transcribed text"""
         self.is_listening = True
-        audio_data = []
-        audio_buffer = []
-        frame_duration_ms = 30
-        frame_size = int(self.sample_rate * frame_duration_ms / 1000)
+        self._rec_pos = 0
+        self._vad_pos = 0
+        
+        # Bound once here so the callback reads closure variables, not attributes
+        rec_buf = self._rec_buf
         
         def callback(indata, frames, time, status):
             if status:
                 print(f"Error: {status}")
             
-            audio_buffer.append(indata.copy())
-            audio_data.append(indata.copy())
+            # Copy the block into the recording buffer, dropping anything past its end
+            pos = self._rec_pos
+            n = min(len(indata), len(rec_buf) - pos)
+            rec_buf[pos:pos + n] = indata[:n]
+            self._rec_pos = pos + n
             
             # Update audio level for visualization
-            if hasattr(self, 'callback_wrapper') and self.callback_wrapper:
-                self.callback_wrapper(indata)
+            wrapper = self.callback_wrapper
+            if wrapper is not None:
+                wrapper(indata)
             
-            # Calculate current audio level
-            self.current_audio_level = float(np.abs(indata).mean())
-            # Check for voice activity (for interrupt detection)
-            global WEBRTCVAD_AVAILABLE
-            if self.is_speaking and len(audio_buffer) > 0 and self.vad is not None and WEBRTCVAD_AVAILABLE:
-                # Process in 30ms chunks for VAD
-                while len(audio_buffer) * frames >= frame_size:
-                    # Take the right amount of data
-                    chunk_data = []
-                    total_frames = 0
-                    while total_frames < frame_size and audio_buffer:
-                        chunk = audio_buffer.pop(0)
-                        chunk_data.append(chunk)
-                        total_frames += len(chunk)
-                    
-                    if total_frames >= frame_size:
-                        try:
-                            # Create a 30ms audio frame
-                            frame_data = np.concatenate(chunk_data, axis=0)[:frame_size]
-                            frame_bytes = (frame_data * 32767).astype(np.int16).tobytes()
-                            
-                            # Check if it's speech
-                            if self.vad.is_speech(frame_bytes, self.sample_rate):
-                                self.audio_queue.put("INTERRUPT")
-                                break                        
-                        except Exception as e:
-                            print(f"VAD error: {e}")                            # If there's a persistent VAD error, disable it
-                            if str(e).find("file") >= 0:  # File-related error
-                                WEBRTCVAD_AVAILABLE = False
-                                print("Disabling VAD due to file errors")
+            # Calculate current audio level (peak of the block) without allocating
+            self.current_audio_level = peak_abs(indata)
+        
+        # Check for voice activity (for interrupt detection) off the audio thread
+        vad_stop = threading.Event()
+        vad_thread = None
+        if self.vad is not None and WEBRTCVAD_AVAILABLE:
+            vad_thread = threading.Thread(target=self._run_vad, args=(vad_stop,))
+            vad_thread.daemon = True
+            vad_thread.start()
         
         # Start recording
         start_time = time.time()
-        with sd.InputStream(callback=callback, channels=1, samplerate=self.sample_rate, 
-                           blocksize=int(self.sample_rate * 0.1)):  # 100ms blocks
-            print("Listening... (Press Ctrl+C to stop)")
-            try:
-                while self.is_listening and (time.time() - start_time < timeout):
-                    time.sleep(0.1)
-            except KeyboardInterrupt:
-                pass
+        try:
+            # Let PortAudio pick the block size for the device's low-latency setting
+            with sd.InputStream(callback=callback, channels=1, samplerate=self.sample_rate,
+                               dtype='float32', blocksize=0, latency='low'):
+                print("Listening... (Press Ctrl+C to stop)")
+                try:
+                    while self.is_listening and (time.time() - start_time < timeout):
+                        time.sleep(0.1)
+                except KeyboardInterrupt:
+                    pass
+        finally:
+            vad_stop.set()
+            if vad_thread is not None:
+                vad_thread.join()
+            # No input any more, so don't leave the last block's level behind
+            self.current_audio_level = 0.0
         
-        if not audio_data:
+        if self._rec_pos == 0:
             self.is_listening = False
-            return ""        # Save the audio data to a temporary file (Whisper works better with files)
-        temp_file = None
+            return ""
+        
+        # View of the recorded samples - no concatenation needed
+        audio_array = self._rec_buf[:self._rec_pos, 0]
+        
+        # Whisper accepts a float32 mono array at 16 kHz directly, so transcribe
+        # from memory and only go through a WAV file if that fails
         try:
-            # Check if we have audio data
-            if not audio_data:
-                print("No audio data captured")
-                self.is_listening = False
-                return ""
-                
-            # Try to use a fixed location in user's documents if temp directory fails
-            try:
-                # First try with audio_utils
-                success, result = save_audio_to_wav(audio_data, self.sample_rate)
-                
-                if not success:
-                    # If that fails, try alternative approach
-                    print(f"Using alternative temp file approach due to error: {result}")
-                    user_dir = os.path.expanduser("~")
-                    docs_dir = os.path.join(user_dir, "Documents")
-                    os.makedirs(os.path.join(docs_dir, "StudyBuddy"), exist_ok=True)
-                    
-                    alt_temp_file = os.path.join(docs_dir, "StudyBuddy", "recording.wav")
-                    
-                    # Process the audio data directly
-                    audio_array = np.concatenate(audio_data, axis=0).flatten()
-                    audio_array = np.clip(audio_array, -1.0, 1.0)
-                    audio_int16 = (audio_array * 32767).astype(np.int16)
-                    
-                    with wave.open(alt_temp_file, 'wb') as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)
-                        wf.setframerate(self.sample_rate)
-                        wf.writeframes(audio_int16.tobytes())
-                        
-                    temp_file = alt_temp_file
-                else:
-                    temp_file = result
+            audio_array = np.clip(audio_array, -1.0, 1.0)
+            text = self._transcribe(audio_array)
+            
+            self.is_listening = False
+            return text
+        except Exception as e:
+            print(f"Direct transcription failed: {e}")
+            print("Falling back to transcription from a temporary file...")
+            return self._transcribe_from_file([audio_array])
+    
+    def _transcribe_from_file(self, audio_data):
+        """Saves recorded audio to a WAV file and transcribes it (fallback path)"""
+        temp_file = None  # Only set for files that must be removed afterwards
+        try:
+            # First try with audio_utils, then a fixed location in user's documents
+            success, result = save_audio_to_wav(audio_data, self.sample_rate)
+            
+            if not success:
+                # If that fails, try alternative approach
+                print(f"Using alternative temp file approach due to error: {result}")
+                user_dir = os.path.expanduser("~")
+                docs_dir = os.path.join(user_dir, "Documents")
+                os.makedirs(os.path.join(docs_dir, "StudyBuddy"), exist_ok=True)
                 
-            except Exception as inner_e:
-                print(f"Both temp file approaches failed: {inner_e}")
-                print("Trying direct transcription without saving to file...")
+                # Overwritten on every call, so it's never cleaned up and no new file is created
+                audio_file = os.path.join(docs_dir, "StudyBuddy", "recording.wav")
                 
-                # As a last resort, try to transcribe audio directly from memory
+                # Process the audio data directly
                 audio_array = np.concatenate(audio_data, axis=0).flatten()
-                result = self.speech_model.transcribe(audio_array)
-                text = result["text"].strip()
+                audio_array = np.clip(audio_array, -1.0, 1.0)
+                audio_int16 = (audio_array * 32767).astype(np.int16)
                 
-                self.is_listening = False
-                return text
+                with wave.open(audio_file, 'wb') as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(2)
+                    wf.setframerate(self.sample_rate)
+                    wf.writeframes(audio_int16.tobytes())
+            else:
+                audio_file = temp_file = result
                 
             # Verify the file exists before transcription
-            if not os.path.exists(temp_file):
-                raise FileNotFoundError(f"Failed to create audio file at {temp_file}")
+            if not os.path.exists(audio_file):
+                raise FileNotFoundError(f"Failed to create audio file at {audio_file}")
             
             # Transcribe the audio
-            print(f"Transcribing audio from {temp_file}")
-            result = self.speech_model.transcribe(temp_file)
-            text = result["text"].strip()
+            print(f"Transcribing audio from {audio_file}")
+            text = self._transcribe(audio_file)
             
             self.is_listening = False
-            return text        
+            return text
         except Exception as e:
             print(f"Error processing audio: {e}")
             if "system cannot find the file specified" in str(e).lower():
@@ -231,46 +470,36 @@ class ConversationalAgent:
             return ""
         finally:
             # Ensure the temporary file is always cleaned up
-            if temp_file:
-                try:
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-                        print(f"Removed temporary file: {temp_file}")
-                except Exception as cleanup_error:
-                    print(f"Warning: Could not clean up temporary file: {cleanup_error}")
+            if cleanup_temp_file(temp_file):
+                print(f"Removed temporary file: {temp_file}")
         
+    def _encode(self, text):
+        """Tokenizes text into a (1, n) tensor of input ids"""
+        return self.tokenizer(text, return_tensors="pt", add_special_tokens=False).input_ids
+    
     def generate_response(self, user_input, document_content=None):
         """Generates text response based on user input"""
         try:
-            # Include document context if available
+            # Only the user's words are tokenized per call; the fixed prompt
+            # pieces are pre-tokenized and the document prefix is cached.
+            # Pieces are split at points where GPT-2's BPE would split anyway,
+            # so the ids match tokenizing the whole prompt at once.
+            pieces = []
             if document_content:
-                prompt = f"Document: {document_content[:500]}...\n\nUser: {user_input}\nAssistant:"
+                pieces.append(_tokenize_doc_prefix(self.tokenizer, document_content[:500]))
+                pieces.append(self._doc_user_ids)
             else:
-                prompt = f"User: {user_input}\nAssistant:"
-                
-            inputs = self.tokenizer(prompt, return_tensors="pt")
+                pieces.append(self._user_ids)
+            pieces.append(self._encode(f" {user_input}"))
+            pieces.append(self._assistant_ids)
+            input_ids = torch.cat(pieces, dim=1)
             
-            # Generate response
-            outputs = self.text_model.generate(
-                inputs.input_ids, 
-                max_length=150,  # Longer for document discussions
-                num_return_sequences=1,
-                temperature=0.7,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
+            # Generate response without autograd bookkeeping
+            with torch.inference_mode():
+                outputs = self.text_model.generate(input_ids, **self._gen_kwargs)
             
-            # Decode the response and format it
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            
-            # Extract just the assistant's response
-            if "Assistant:" in response:
-                response = response.split("Assistant:", 1)[1].strip()
-            else:
-                # If the model didn't follow the format correctly, take everything after the prompt
-                response = response[len(prompt):].strip()
+            # Decode just the tokens generated after "Assistant:"
+            response = self.tokenizer.decode(outputs[0][input_ids.shape[1]:], skip_special_tokens=True).strip()
                 
             return response
         except Exception as e:
@@ -283,18 +512,8 @@ class ConversationalAgent:
         
         try:
             if self.use_tts:
-                # Use the TTS library
-                wav = self.tts.tts(text)
-                
-                def audio_callback(_outdata, frames, _time, _status):
-                    if not self.audio_queue.empty():
-                        message = self.audio_queue.get()
-                        if message == "INTERRUPT":
-                            raise sd.CallbackAbort
-                        
-                # Play the generated audio
-                sd.play(wav, self.sample_rate, callback=audio_callback)
-                sd.wait()
+                # Use the TTS library, playing each sentence as soon as it's ready
+                self._speak_streamed(text)
             else:
                 # Use system TTS
                 self.tts_engine.say(text)
@@ -304,6 +523,85 @@ class ConversationalAgent:
         finally:
             self.is_speaking = False
 
+    def _synthesize_sentence(self, sentence):
+        """Synthesizes one sentence, caching repeated phrases like greetings and apologies"""
+        wav = self._phrase_cache.get(sentence)
+        if wav is not None:
+            self._phrase_cache.move_to_end(sentence)
+            return wav
+        
+        wav = np.asarray(self.tts.tts(sentence), dtype=np.float32)
+        wav.setflags(write=False)
+        self._phrase_cache[sentence] = wav
+        if len(self._phrase_cache) > _PHRASE_CACHE_SIZE:
+            self._phrase_cache.popitem(last=False)
+        return wav
+
+    def _speak_streamed(self, text):
+        """Synthesizes text sentence by sentence while earlier sentences play"""
+        sentences = [sentence for sentence in _SENTENCE_END_RE.split(text.strip()) if sentence]
+        chunks = queue.Queue(maxsize=2)  # Bounds how far synthesis runs ahead of playback
+        finished = threading.Event()
+        
+        def put(item):
+            # Give up if playback has ended (e.g. interrupted) and nobody will read it
+            while not finished.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def synthesize():
+            try:
+                for sentence in sentences:
+                    if not put(self._synthesize_sentence(sentence)):
+                        return
+            except Exception as e:
+                print(f"Error during speech synthesis: {e}")
+            finally:
+                put(None)
+        
+        current = [None, 0]  # Chunk being played and read position within it
+        
+        def audio_callback(outdata, frames, _time, _status):
+            if self.interrupt_event.is_set():
+                self.interrupt_event.clear()
+                raise sd.CallbackAbort
+            
+            filled = 0
+            while filled < frames:
+                if current[0] is None:
+                    try:
+                        chunk = chunks.get_nowait()
+                    except queue.Empty:
+                        break  # Synthesis hasn't caught up yet, play silence
+                    if chunk is None:
+                        outdata[filled:] = 0
+                        raise sd.CallbackStop
+                    current[0], current[1] = chunk, 0
+                
+                chunk, pos = current
+                n = min(frames - filled, len(chunk) - pos)
+                outdata[filled:filled + n, 0] = chunk[pos:pos + n]
+                filled += n
+                current[1] = pos + n
+                if current[1] >= len(chunk):
+                    current[0] = None
+            outdata[filled:] = 0
+        
+        producer = threading.Thread(target=synthesize)
+        producer.daemon = True
+        producer.start()
+        try:
+            with sd.OutputStream(samplerate=self.tts_sample_rate, channels=1, dtype='float32',
+                                 callback=audio_callback, finished_callback=finished.set):
+                finished.wait()
+        finally:
+            finished.set()
+            producer.join()
+    
     def run(self, timeout=10):
         """Main loop for the conversational agent"""
         print("Hello! I'm your conversational agent. Start speaking to interact with me.")
@@ -402,11 +700,9 @@ class ConversationalAgent:
         
         # If Windows, check if Visual C++ Redistributable is likely installed
         if sys.platform == 'win32':
-            try:
-                import ctypes
-                msvcr = ctypes.CDLL('msvcp140.dll')
+            if _has_msvcrt():
                 print("✓ Microsoft Visual C++ Redistributable appears to be installed")
-            except:
+            else:
                 print("⚠ Microsoft Visual C++ Redistributable might be missing")
                 print("Download from: https://aka.ms/vs/16/release/vc_redist.x64.exe")
                 # Don't fail completely, just warn
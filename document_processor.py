@@ -4,20 +4,33 @@ This module handles uploading, parsing, and extracting information from document
 """
 
 import os
+import mmap
 import tempfile
 from typing import Dict, List, Optional
 import re
 import string
 
+# A markdown-style heading: any line starting with '#'
+_HEADING_RE = re.compile(r'^#.*$', re.MULTILINE)
+# Number of characters of the first paragraph shown in a summary
+_PREVIEW_LENGTH = 150
+
+# Lookup tables for turning section titles into questions
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+_QUESTION_PREFIXES = ('what', 'when', 'where', 'who', 'why', 'how')
+_ARTICLE_PREFIXES = ('the ', 'a ', 'an ')
+
 class DocumentProcessor:
     """
     Processes documents for the StudyBuddy application.
     Supports text extraction and simple question generation.
     """
     
+    # File extensions that can be loaded (lowercase)
+    supported_extensions = frozenset({'.txt', '.md'})
+    
     def __init__(self):
         """Initialize the document processor"""
-        self.supported_extensions = ['.txt', '.md']
         self.documents = {}  # Store loaded documents
         self.current_document = None
         
@@ -41,21 +54,52 @@ class DocumentProcessor:
             return False
             
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
             doc_name = os.path.basename(file_path)
-            self.documents[doc_name] = {
+            mtime = os.path.getmtime(file_path)
+            
+            # Skip re-reading a file that's already loaded and unchanged
+            known = self.documents.get(doc_name)
+            if known and known['path'] == file_path and known.get('mtime') == mtime:
+                self.current_document = doc_name
+                return True
+                
+            content = self._read_text(file_path)
+            document = {
                 'content': content,
                 'path': file_path,
+                'mtime': mtime,
                 'sections': self._split_into_sections(content)
             }
+            self._cache_summary(doc_name, document)
+            self.documents[doc_name] = document
             self.current_document = doc_name
             return True
         except Exception as e:
             print(f"Error loading document: {e}")
             return False
     
+    def _read_text(self, file_path: str) -> str:
+        """
+        Read a UTF-8 text file, decoding straight from a memory map so the
+        file's bytes are never copied into an intermediate buffer
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            str: File content with newlines normalized to '\\n'
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""  # Empty files can't be memory-mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                content = str(mm, 'utf-8')
+        
+        # Match text-mode reading, which translates \r\n and \r to \n
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+    
     def get_current_document_content(self) -> str:
         """
         Get the content of the current document
@@ -76,27 +120,7 @@ class DocumentProcessor:
         """
         if not self.current_document or self.current_document not in self.documents:
             return "No document loaded"
-            
-        content = self.documents[self.current_document]['content']
-        # Simple summary - first paragraph and length info
-        lines = content.split('\n')
-        non_empty_lines = [line for line in lines if line.strip()]
-        
-        if not non_empty_lines:
-            return "Document is empty"
-            
-        first_para = ""
-        for line in non_empty_lines:
-            if line.strip():
-                first_para += line + " "
-            else:
-                break
-                
-        word_count = len(content.split())
-        
-        return (f"Document: {self.current_document}\n"
-                f"Word count: {word_count}\n\n"
-                f"Preview: {first_para[:150]}...")
+        return self.documents[self.current_document]['summary_text']
     
     def generate_questions(self, num_questions: int = 3) -> List[Dict[str, str]]:
         """
@@ -111,13 +135,13 @@ class DocumentProcessor:
         if not self.current_document or self.current_document not in self.documents:
             return []
             
-        sections = self.documents[self.current_document]['sections']
-        if not sections:
-            return []
-            
-        # Simple question generation based on sections
+        # Simple question generation based on sections, stopping as soon as
+        # enough questions have been found
         questions = []
-        for section in sections[:num_questions]:
+        for section in self.documents[self.current_document]['sections']:
+            if len(questions) >= num_questions:
+                break
+                
             title = section.get('title', '')
             content = section.get('content', '')
             
@@ -127,9 +151,9 @@ class DocumentProcessor:
             # Generate a simple question from the title
             question = self._title_to_question(title)
             
-            # Take the first sentence as the answer
-            sentences = content.split('.')
-            answer = sentences[0] if sentences else content[:100]
+            # Take the first sentence as the answer, without splitting the rest
+            head, _, _ = content.partition('.')
+            answer = head if head else content[:100]
             
             questions.append({
                 'question': question,
@@ -138,6 +162,41 @@ class DocumentProcessor:
             
         return questions
     
+    def _cache_summary(self, doc_name: str, document: Dict) -> None:
+        """
+        Precompute the summary for a document so later requests are
+        lookups instead of scans of the full text
+        
+        Args:
+            doc_name: Name the document is stored under
+            document: Document dict with 'content' and 'sections' keys, updated in place
+        """
+        content = document['content']
+        # Simple summary - first paragraph and length info, gathered in one
+        # pass over the lines. Only the first _PREVIEW_LENGTH characters of
+        # the paragraph are shown, so stop collecting it after that.
+        word_count = 0
+        preview_parts = []
+        preview_length = 0
+        for line in content.splitlines():
+            words = line.split()
+            if not words:
+                continue
+            word_count += len(words)
+            if preview_length < _PREVIEW_LENGTH:
+                preview_parts.append(line + " ")
+                preview_length += len(line) + 1
+        first_para = "".join(preview_parts)
+        
+        document['word_count'] = word_count
+        document['first_paragraph'] = first_para
+        if not word_count:
+            document['summary_text'] = "Document is empty"
+        else:
+            document['summary_text'] = (f"Document: {doc_name}\n"
+                                        f"Word count: {word_count}\n\n"
+                                        f"Preview: {first_para[:_PREVIEW_LENGTH]}...")
+    
     def _split_into_sections(self, content: str) -> List[Dict[str, str]]:
         """
         Split document content into sections based on headings
@@ -148,40 +207,20 @@ class DocumentProcessor:
         Returns:
             List of dictionaries with 'title' and 'content' keys
         """
-        # Simple section splitting using markdown-style headings
-        lines = content.split('\n')
-        sections = []
-        
-        current_title = None
-        current_content = []
-        
-        for line in lines:
-            # Check if the line is a heading (markdown style)
-            if line.startswith('#'):
-                # Save previous section if it exists
-                if current_title is not None:
-                    sections.append({
-                        'title': current_title,
-                        'content': '\n'.join(current_content).strip()
-                    })
-                
-                # Start a new section
-                current_title = line.lstrip('#').strip()
-                current_content = []
-            else:
-                current_content.append(line)
-        
-        # Add the last section
-        if current_title is not None:
-            sections.append({
-                'title': current_title,
-                'content': '\n'.join(current_content).strip()
-            })
-        elif current_content:
+        # Locate every markdown-style heading in one regex pass and slice the
+        # section bodies out of the text between them
+        headings = list(_HEADING_RE.finditer(content))
+        if not headings:
             # If no headings were found, create a default section
+            return [{'title': 'Main Content', 'content': content.strip()}]
+        
+        # Text before the first heading is dropped
+        sections = []
+        for i, match in enumerate(headings):
+            body_end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
             sections.append({
-                'title': 'Main Content',
-                'content': '\n'.join(current_content).strip()
+                'title': match.group().lstrip('#').strip(),
+                'content': content[match.end():body_end].strip()
             })
             
         return sections
@@ -197,20 +236,17 @@ class DocumentProcessor:
             str: A question based on the title
         """
         # Remove punctuation
-        title = title.translate(str.maketrans('', '', string.punctuation))
-        title = title.strip()
+        title = title.translate(_PUNCT_TABLE).strip()
+        if not title:
+            return "What is this section about?"
         
-        # Simple title to question conversion
-        if title.lower().startswith(('what', 'when', 'where', 'who', 'why', 'how')):
+        # Simple title to question conversion, lowercasing only once
+        title_lower = title.lower()
+        if title_lower.startswith(_QUESTION_PREFIXES):
             # It's already question-like, just add a question mark
             return f"{title}?"
-        
-        # Try to form a question
-        words = title.split()
-        if len(words) == 0:
-            return "What is this section about?"
             
-        if title.lower().startswith(('the', 'a', 'an')):
+        if title_lower.startswith(_ARTICLE_PREFIXES):
             # For titles starting with articles
             return f"What is {title}?"
         
@@ -6,6 +6,7 @@ Main entry point for StudyBuddy application.
 import sys
 import os
 import argparse
+import importlib.util
 from PyQt5.QtWidgets import QApplication
 
 from studybuddy_ui import ConversationalAgentUI
@@ -20,11 +21,12 @@ def parse_args():
 def check_environment():
     """Check for necessary environment components and dependencies"""
     try:
-        # Check for critical dependencies
-        import numpy
-        import torch
-        import sounddevice
-        import whisper
+        # Check for critical dependencies without importing them; the heavy
+        # imports happen later on the agent's background init thread
+        missing = [name for name in ('numpy', 'torch', 'sounddevice', 'whisper')
+                   if importlib.util.find_spec(name) is None]
+        if missing:
+            return False, f"Missing dependency: {', '.join(missing)}"
         
         # Check if temp directory is writable
         import tempfile
@@ -32,8 +34,6 @@ def check_environment():
             tmp.write(b"test")
             
         return True, ""
-    except ImportError as e:
-        return False, f"Missing dependency: {str(e)}"
     except Exception as e:
         return False, f"Environment error: {str(e)}"
 
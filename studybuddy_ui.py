@@ -3,20 +3,17 @@ Desktop UI for StudyBuddy conversational agent.
 """
 
 import sys
+import html
 import threading
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTextEdit, QPushButton, 
-                           QVBoxLayout, QWidget, QLabel, QSlider, QHBoxLayout,
+                           QVBoxLayout, QWidget, QLabel, QHBoxLayout,
                            QComboBox, QMessageBox, QFileDialog, QTabWidget,
-                           QListWidget, QListWidgetItem)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject
-from PyQt5.QtGui import QFont, QColor, QPalette, QIcon
+                           QListWidget)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QObject, QPointF
+from PyQt5.QtGui import QFont, QColor, QPalette, QPainter, QPen, QPolygonF, QTextCursor
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import time
 import os
 
-from conversational_agent import ConversationalAgent
 from document_processor import DocumentProcessor
 
 class SignalEmitter(QObject):
@@ -27,33 +24,84 @@ class SignalEmitter(QObject):
     audio_level = pyqtSignal(float)
     error_message = pyqtSignal(str)
 
-class AudioVisualizer(FigureCanvas):
+class AgentWorker(QObject):
+    """Runs the conversation loop on a QThread, reporting through a SignalEmitter"""
+    finished = pyqtSignal()
+    
+    def __init__(self, agent, signals):
+        super().__init__()
+        self.agent = agent
+        self.signals = signals
+    
+    def is_stopped(self):
+        """Whether stop() has been requested for the thread this worker runs on"""
+        return self.thread().isInterruptionRequested()
+    
+    def run(self):
+        """Conversation loop: greet, then listen, respond and speak until stopped"""
+        try:
+            # Welcome message
+            welcome_msg = "Hello! I'm your study buddy. How can I help you today?"
+            self.signals.text_update.emit("agent", welcome_msg)
+            self.agent.speak(welcome_msg)
+            
+            while not self.is_stopped():
+                self.signals.listening_status.emit(True)
+                user_input = self.agent.listen(timeout=10)
+                if not user_input or self.is_stopped():
+                    continue
+                    
+                self.signals.text_update.emit("user", user_input)
+                
+                response = self.agent.generate_response(user_input)
+                self.signals.text_update.emit("agent", response)
+                
+                self.signals.speaking_status.emit(True)
+                self.agent.speak(response)
+                self.signals.speaking_status.emit(False)
+        except Exception as e:
+            self.signals.error_message.emit(f"Error during conversation: {str(e)}")
+            self.signals.speaking_status.emit(False)
+            self.signals.listening_status.emit(False)
+        finally:
+            self.finished.emit()
+    
+    def stop(self):
+        """Ask the loop to exit; safe to call from any thread"""
+        self.thread().requestInterruption()
+        self.agent.is_listening = False
+
+class AudioVisualizer(QWidget):
     """Visualizer for audio input/output levels"""
     def __init__(self, parent=None, width=5, height=1, dpi=100):
-        plt.style.use('dark_background')
-        fig, self.ax = plt.subplots(figsize=(width, height), dpi=dpi)
-        super(AudioVisualizer, self).__init__(fig)
-        self.setParent(parent)
-        
-        # Initial empty plot
-        self.x = np.linspace(0, 100, 100)
-        self.y = np.zeros(100)
-        self.line, = self.ax.plot(self.x, self.y, '-', lw=2, color='cyan')
-        
-        self.ax.set_ylim(0, 1)
-        self.ax.set_xlim(0, 100)
-        self.ax.axis('off')
-        fig.tight_layout(pad=0)
-        fig.patch.set_alpha(0.0)
+        super(AudioVisualizer, self).__init__(parent)
+        self.setMinimumSize(int(width * dpi), int(height * dpi))
+        self.pen = QPen(QColor('cyan'), 2)
+        
+        # Ring buffer of recent levels; _idx is the oldest entry / next write slot
+        self._buf = np.zeros(100, dtype=np.float32)
+        self._idx = 0
 
     def update_plot(self, level):
         """Update the audio level visualization"""
-        # Shift values left
-        self.y[:-1] = self.y[1:]
-        # Add new value
-        self.y[-1] = min(level * 5, 1.0)  # Scale up for better visibility
-        self.line.set_ydata(self.y)
-        self.draw()
+        # Overwrite the oldest value instead of shifting the whole history
+        self._buf[self._idx] = min(level, 1.0)  # Peak level is already relative to full scale
+        self._idx = (self._idx + 1) % len(self._buf)
+        self.update()
+
+    def paintEvent(self, event):
+        """Draw the level history as a single polyline"""
+        # Oldest to newest, left to right
+        levels = np.concatenate((self._buf[self._idx:], self._buf[:self._idx]))
+        w, h = self.width(), self.height()
+        step = w / (len(levels) - 1)
+        points = [QPointF(i * step, h * (1.0 - value)) for i, value in enumerate(levels.tolist())]
+        
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.pen)
+        painter.drawPolyline(QPolygonF(points))
+        painter.end()
 
 class ConversationalAgentUI(QMainWindow):
     """Main UI class for StudyBuddy"""
@@ -65,6 +113,7 @@ class ConversationalAgentUI(QMainWindow):
         
         # Initialize signals
         self.signals = SignalEmitter()
+        self._last_status = None  # Text currently shown in the status label
         
         # Initialize document processor
         self.document_processor = DocumentProcessor()
@@ -77,7 +126,8 @@ class ConversationalAgentUI(QMainWindow):
         
         # Initialize agent in a separate thread
         self.agent = None
-        self.agent_thread = None
+        self.worker = None
+        self.worker_thread = None
         self.is_running = False
         self.init_agent()
         
@@ -131,6 +181,8 @@ class ConversationalAgentUI(QMainWindow):
         self.conversation = QTextEdit()
         self.conversation.setReadOnly(True)
         self.conversation.setFont(QFont('Arial', 12))
+        # Bound the scrollback so long conversations don't slow down layout
+        self.conversation.document().setMaximumBlockCount(500)
         chat_layout.addWidget(self.conversation)
         
         # Audio visualizer
@@ -255,14 +307,19 @@ class ConversationalAgentUI(QMainWindow):
         """Initialize the conversational agent in a background thread"""
         def agent_init_thread():
             try:
+                # Imported here so torch/whisper load off the UI thread
+                from conversational_agent import ConversationalAgent
+                
                 use_tts = self.tts_selector.currentIndex() != 2  # Not System TTS
+                # The agent's input callback keeps current_audio_level up to
+                # date; update_audio_level polls it, so no extra hook is needed
                 self.agent = ConversationalAgent(use_tts=use_tts)
-                self.status_label.setText("Ready")
+                self._set_status("Ready")
                 self.start_button.setEnabled(True)
             except Exception as e:
                 self.signals.error_message.emit(f"Error initializing agent: {str(e)}")
                 
-        self.status_label.setText("Initializing models...")
+        self._set_status("Initializing models...")
         self.start_button.setEnabled(False)
         
         # Start initialization in background
@@ -272,40 +329,60 @@ class ConversationalAgentUI(QMainWindow):
     
     def update_conversation(self, speaker, text):
         """Update the conversation history with new text"""
-        if speaker == "user":
-            self.conversation.append(f"<b>You:</b> {text}")
-        else:
-            self.conversation.append(f"<b>StudyBuddy:</b> {text}")
+        who = "You" if speaker == "user" else "StudyBuddy"
+        
+        # Insert at the end in a new block rather than append(), which
+        # re-parses and re-lays out the document; text is escaped so user
+        # input can't inject markup
+        cursor = self.conversation.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        if not self.conversation.document().isEmpty():
+            cursor.insertBlock()
+        cursor.insertHtml(f"<b>{who}:</b> {html.escape(text)}")
+        self.conversation.setTextCursor(cursor)
         
         # Auto-scroll to the bottom
         scroll_bar = self.conversation.verticalScrollBar()
         scroll_bar.setValue(scroll_bar.maximum())
         
+    def _set_status(self, status):
+        """Show a status message, skipping the relayout if it's unchanged"""
+        if status != self._last_status:
+            self.status_label.setText(status)
+            self._last_status = status
+    
     def update_speaking_status(self, is_speaking):
         """Update UI to reflect speaking status"""
         if is_speaking:
-            self.status_label.setText("Speaking...")
+            self._set_status("Speaking...")
         elif self.agent and self.agent.is_listening:
-            self.status_label.setText("Listening...")
+            self._set_status("Listening...")
         else:
-            self.status_label.setText("Ready")
+            self._set_status("Ready")
     
     def update_listening_status(self, is_listening):
         """Update UI to reflect listening status"""
         if is_listening:
-            self.status_label.setText("Listening...")
+            self._set_status("Listening...")
         elif self.agent and self.agent.is_speaking:
-            self.status_label.setText("Speaking...")
+            self._set_status("Speaking...")
         else:
-            self.status_label.setText("Ready")
+            self._set_status("Ready")
     
     def update_audio_level(self):
         """Update the audio level visualization"""
         if self.agent and hasattr(self.agent, 'current_audio_level'):
             level = self.agent.current_audio_level
-            self.signals.audio_level.emit(level)
         else:
-            self.signals.audio_level.emit(0)
+            level = 0.0
+        
+        # Nothing to show while idle; start_conversation restarts the timer
+        if not self.is_running and level <= 0.01:
+            self.timer.stop()
+            return
+        
+        # One sample per tick, even when the level is steady, so the plot keeps scrolling
+        self.signals.audio_level.emit(level)
             
     def toggle_conversation(self):
         """Start or stop the conversation"""
@@ -316,62 +393,39 @@ class ConversationalAgentUI(QMainWindow):
     
     def start_conversation(self):
         """Begin the conversation loop"""
+        if self.worker_thread and self.worker_thread.isRunning():
+            # The previous loop is still winding down
+            return
         self.is_running = True
         self.start_button.setText("Stop Conversation")
+        self.timer.start()
         
-        # Define the agent thread function
-        def agent_thread_func():
-            try:
-                # Welcome message
-                welcome_msg = "Hello! I'm your study buddy. How can I help you today?"
-                self.signals.text_update.emit("agent", welcome_msg)
-                self.agent.speak(welcome_msg)
-                
-                while self.is_running:
-                    self.signals.listening_status.emit(True)
-                    user_input = self.agent.listen(timeout=10)
-                    if not user_input or not self.is_running:
-                        continue
-                        
-                    self.signals.text_update.emit("user", user_input)
-                    
-                    response = self.agent.generate_response(user_input)
-                    self.signals.text_update.emit("agent", response)
-                    
-                    self.signals.speaking_status.emit(True)
-                    self.agent.speak(response)
-                    self.signals.speaking_status.emit(False)
-            except Exception as e:
-                self.signals.error_message.emit(f"Error during conversation: {str(e)}")
-                self.is_running = False
-                self.signals.speaking_status.emit(False)
-                self.signals.listening_status.emit(False)
-        
-        # Add audio level monitoring to the agent
         if self.agent:
-            original_listen = self.agent.listen
-            def listen_with_levels(*args, **kwargs):
-                def update_level(indata, *_args):
-                    if hasattr(indata, 'max'):
-                        self.agent.current_audio_level = float(abs(indata).max())
-                
-                self.agent.callback_wrapper = update_level
-                return original_listen(*args, **kwargs)
-                
-            self.agent.listen = listen_with_levels
-            
-            # Start the agent thread
-            self.agent_thread = threading.Thread(target=agent_thread_func)
-            self.agent_thread.daemon = True
-            self.agent_thread.start()
+            # Run the conversation loop on its own QThread
+            self.worker_thread = QThread()
+            self.worker = AgentWorker(self.agent, self.signals)
+            self.worker.moveToThread(self.worker_thread)
+            self.worker_thread.started.connect(self.worker.run)
+            self.worker.finished.connect(self.worker_thread.quit)
+            self.worker_thread.finished.connect(self._on_worker_finished)
+            self.worker_thread.start()
+    
+    def _on_worker_finished(self):
+        """Reset the controls once the conversation loop has exited, also after an error"""
+        self.is_running = False
+        self.start_button.setText("Start Conversation")
+        self.start_button.setEnabled(True)
     
     def stop_conversation(self):
         """Stop the ongoing conversation"""
         self.is_running = False
-        if self.agent:
-            self.agent.is_listening = False
+        if self.worker:
+            self.worker.stop()
+        if self.worker_thread and self.worker_thread.isRunning():
+            # Don't start a second loop on the same agent until this one exits
+            self.start_button.setEnabled(False)
         self.start_button.setText("Start Conversation")
-        self.status_label.setText("Ready")
+        self._set_status("Ready")
     
     def show_error(self, message):
         """Display an error message to the user"""
@@ -388,12 +442,14 @@ class ConversationalAgentUI(QMainWindow):
         
         if file_path:
             if self.document_processor.load_document(file_path):
-                # Add to document list
+                # Add to document list unless it's already there (re-upload)
                 doc_name = os.path.basename(file_path)
-                self.document_list.addItem(doc_name)
+                items = self.document_list.findItems(doc_name, Qt.MatchExactly)
+                if not items:
+                    self.document_list.addItem(doc_name)
+                    items = self.document_list.findItems(doc_name, Qt.MatchExactly)
                 
                 # Select the document
-                items = self.document_list.findItems(doc_name, Qt.MatchExactly)
                 if items:
                     self.document_list.setCurrentItem(items[0])
                 
@@ -479,8 +535,16 @@ class ConversationalAgentUI(QMainWindow):
     def closeEvent(self, event):
         """Clean up when closing the window"""
         self.is_running = False
-        if self.agent_thread and self.agent_thread.is_alive():
-            self.agent_thread.join(timeout=1.0)
+        if self.worker:
+            self.worker.stop()
+            if self.agent.is_speaking:
+                # Cut playback short rather than waiting for the sentence to end
+                self.agent.interrupt_event.set()
+        if self.worker_thread:
+            self.worker_thread.quit()
+            # Block until the loop has really exited; destroying a running
+            # QThread aborts the process
+            self.worker_thread.wait()
         event.accept()
 
 def main():